@@ -0,0 +1,182 @@
+import bz2
+import gzip
+import lzma
+import sys
+import zlib
+from bisect import bisect_right
+from pathlib import Path
+
+# transparent read access to .gz/.bz2/.xz files.
+# Data is decompressed as a stream; checkpoints recorded on the way let later
+# reads resume close to the wanted offset instead of from the start.
+
+MAGIC = (
+    (b"\x1f\x8b", "gz"),
+    (b"\xfd7zXZ\x00", "xz"),
+)
+# "BZh" + block size digit, then a block header or the end-of-stream marker
+BZ2_BLOCK_MAGIC = (b"1AY&SY", b"\x17rE8P\x90")
+SUFFIXES = {".gz": "gz", ".bz2": "bz2", ".xz": "xz"}
+CHUNK = 64 * 1024
+CHECKPOINT_SPAN = 4 * 1024 * 1024  # uncompressed bytes between checkpoints
+
+def detect_compression(path: Path) -> str | None:
+    try:
+        with path.open("rb") as f:
+            head = f.read(10)
+    except OSError:
+        return None
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            return fmt
+    if head[:3] == b"BZh" and head[3:4] in b"123456789" and head[4:10] in BZ2_BLOCK_MAGIC:
+        return "bz2"
+    return None
+
+def compression_for(path: Path) -> str | None:
+    # format to recompress with: keep the existing file's, else go by suffix
+    if path.exists():
+        fmt = detect_compression(path)
+        if fmt:
+            return fmt
+    return SUFFIXES.get(path.suffix.lower())
+
+def open_compressed(path: Path, mode: str, fmt: str):
+    if fmt == "gz":
+        return gzip.open(path, mode, encoding="utf-8")
+    if fmt == "bz2":
+        return bz2.open(path, mode, encoding="utf-8")
+    return lzma.open(path, mode, encoding="utf-8")
+
+def _decompressor(fmt: str):
+    if fmt == "gz":
+        return zlib.decompressobj(wbits=31)
+    if fmt == "bz2":
+        return bz2.BZ2Decompressor()
+    return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+
+class CompressedFile:
+    """Read-only, seekable view of the decompressed bytes of a file."""
+
+    def __init__(self, path: Path, fmt: str | None = None):
+        self.path = path
+        self.fmt = fmt or detect_compression(path)
+        if self.fmt is None:
+            raise ValueError(f"{path.name} is not a gzip, bzip2 or xz file")
+        # (uncompressed offset, compressed offset, decompressor state or None)
+        # None means a fresh decompressor, i.e. the start of a stream/member.
+        # Only zlib can snapshot its state, so bz2/xz resume at member starts.
+        self.checkpoints: list[tuple[int, int, object]] = [(0, 0, None)]
+        self.size: int | None = None  # known once the end has been reached
+        # where the last read stopped: (offset of pending, compressed offset,
+        # decompressor, pending output). Forward reads resume from here.
+        self._live: tuple[int, int, object, bytes] | None = None
+
+    def _add_checkpoint(self, upos: int, cpos: int, state):
+        if upos > self.checkpoints[-1][0]:
+            self.checkpoints.append((upos, cpos, state))
+
+    def _needs_input(self, d, pending: bytes) -> bool:
+        if self.fmt == "gz":
+            # zlib may still hold output with all input consumed if it hit the cap
+            return not d.unconsumed_tail and len(pending) < CHUNK
+        return d.needs_input
+
+    def chunks(self, offset: int = 0):
+        """Yield (uncompressed offset, bytes) starting at or before offset."""
+        upos, cpos, state = self.checkpoints[
+            bisect_right([cp[0] for cp in self.checkpoints], offset) - 1
+        ]
+        last = upos
+        live, self._live = self._live, None
+        if live and upos <= live[0] <= offset:
+            upos, cpos, d, pending = live
+        else:
+            d = state.copy() if state is not None else _decompressor(self.fmt)
+            pending = b""
+        with self.path.open("rb") as f:
+            f.seek(cpos)
+            while True:
+                if pending:
+                    # remembered in case the caller stops after this chunk
+                    self._live = (upos, cpos, d, pending)
+                    yield upos, pending
+                    self._live = None
+                    upos += len(pending)
+                if d.eof:
+                    # end of one gzip member / bz2 or xz stream
+                    data = d.unused_data
+                    if not data.strip(b"\0"):
+                        data = f.read(CHUNK)
+                        cpos += len(data)
+                        if not data.strip(b"\0"):
+                            self.size = upos
+                            return
+                    d = _decompressor(self.fmt)
+                    self._add_checkpoint(upos, cpos - len(data), None)
+                    last = upos
+                elif self._needs_input(d, pending):
+                    data = f.read(CHUNK)
+                    if not data:
+                        raise EOFError(
+                            "Compressed file ended before the end-of-stream marker was reached"
+                        )
+                    cpos += len(data)
+                else:
+                    # output was capped: drain what the last input still holds
+                    data = d.unconsumed_tail if self.fmt == "gz" else b""
+                pending = d.decompress(data, CHUNK)
+                if (self.fmt == "gz" and not d.eof and not d.unconsumed_tail
+                        and upos - last >= CHECKPOINT_SPAN):
+                    # only once all read input is consumed, so cpos is exact
+                    self._add_checkpoint(upos + len(pending), cpos, d.copy())
+                    last = upos + len(pending)
+
+    def read(self, offset: int, size: int) -> bytes:
+        parts, end = [], offset + size
+        for pos, data in self.chunks(offset):
+            if pos + len(data) <= offset:
+                continue
+            parts.append(data[max(0, offset - pos):end - pos])
+            if pos + len(data) >= end:
+                break
+        return b"".join(parts)
+
+    def window(self, offset: int, size: int) -> tuple[int, int, str]:
+        """Decoded text of whole lines around [offset, offset + size), with its byte range."""
+        offset = max(0, offset)
+        data = self.read(max(0, offset - 1), size + min(offset, 1))
+        if offset > 0:
+            # the extra leading byte tells whether offset already starts a line
+            at_line_start, data = data[:1] == b"\n", data[1:]
+        start, end = offset, offset + len(data)
+        if offset > 0 and not at_line_start:
+            # start on the line after the cut, unless that drops everything
+            cut = data.find(b"\n") + 1
+            if 0 < cut < len(data):
+                data, start = data[cut:], start + cut
+        if end - offset == size:
+            # more may follow: stop at the last complete line
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                data, end = data[:cut], start + cut
+        return start, end, data.decode("utf-8", errors="replace")
+
+    def total_size(self) -> int:
+        if self.size is None:
+            for _ in self.chunks(sys.maxsize):
+                pass
+        return self.size
+
+    def count(self) -> tuple[int, int]:
+        """Return (words, lines) of the decompressed text without holding it all."""
+        words = newlines = 0
+        seen = in_word = False
+        for _, data in self.chunks(0):
+            seen = True
+            newlines += data.count(b"\n")
+            words += len(data.split())
+            if in_word and not data[:1].isspace():
+                words -= 1  # the word cut at the previous chunk end goes on here
+            in_word = not data[-1:].isspace()
+        return words, newlines + 1 if seen else 0
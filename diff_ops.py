@@ -0,0 +1,369 @@
+from array import array
+from contextlib import nullcontext
+from bisect import bisect_left
+from pathlib import Path
+
+from compress_ops import CompressedFile, detect_compression
+
+# line diffing for the `diff` command.
+# Lines are hashed while the file is streamed into two integer arrays per file
+# (hash + byte offset); matching works on those plus sorted copies of the
+# hashes, and text is re-read for the hunks only. Compressed files are read
+# through a CompressedFile view, so offsets are into the decompressed bytes.
+
+CONTEXT = 3
+MAX_EDIT_STEPS = 256  # past this bisect splits at its furthest point instead
+SIDE_WIDTH = 60
+
+def _open_view(path: Path) -> CompressedFile | None:
+    fmt = detect_compression(path)
+    return CompressedFile(path, fmt) if fmt else None
+
+def _view_lines(view: CompressedFile):
+    parts = []
+    for _, data in view.chunks(0):
+        start = 0
+        while end := data.find(b"\n", start) + 1:
+            parts.append(data[start:end])
+            yield b"".join(parts)
+            parts, start = [], end
+        if start < len(data):
+            parts.append(data[start:])
+    if parts:
+        yield b"".join(parts)
+
+def index_lines(path: Path, view: CompressedFile | None = None) -> tuple[array, array]:
+    hashes, offsets = array("q"), array("q")
+    pos = 0
+    with path.open("rb") if view is None else nullcontext(_view_lines(view)) as f:
+        for line in f:
+            offsets.append(pos)
+            pos += len(line)
+            hashes.append(hash(line.rstrip(b"\r\n")))
+    return hashes, offsets
+
+# ---------- Matching ----------
+def _bisect(a, alo, ahi, b, blo, bhi, max_steps: int) -> tuple[int, int] | None:
+    # Myers' middle snake in linear space; returns a split point relative to
+    # (alo, blo), or None when no split makes progress
+    n, m = ahi - alo, bhi - blo
+    steps = min((n + m + 1) // 2, max_steps)
+    v_offset, v_length = steps + 1, 2 * steps + 3
+    v1 = [-1] * v_length
+    v1[v_offset + 1] = 0
+    v2 = v1[:]
+    delta = n - m
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(steps):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                    if x1 >= n - v2[k2_offset]:
+                        return x1, y1
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[ahi - x2 - 1] == b[bhi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    if x1 >= n - x2:
+                        return x1, v_offset + x1 - k1_offset
+
+    # too expensive (GNU diff's heuristic): split at whichever of the forward
+    # and reverse paths got furthest, and let the caller keep going from there
+    best, split = 0, None
+    for k_offset in range(v_length):
+        k = k_offset - v_offset
+        x1, x2 = v1[k_offset], v2[k_offset]
+        if 0 <= x1 <= n and 0 <= x1 - k <= m and x1 + x1 - k > best:
+            best, split = 2 * x1 - k, (x1, x1 - k)
+        if 0 <= x2 <= n and 0 <= x2 - k <= m and x2 + x2 - k > best:
+            best, split = 2 * x2 - k, (n - x2, m - x2 + k)
+    if split in (None, (0, 0), (n, m)):
+        return None
+    return split
+
+def _unique_values(seq, lo: int, hi: int) -> array:
+    # sorted hashes that occur exactly once in seq[lo:hi]
+    ordered = sorted(seq[lo:hi])
+    out = array("q")
+    i, n = 0, len(ordered)
+    while i < n:
+        h, j = ordered[i], i + 1
+        while j < n and ordered[j] == h:
+            j += 1
+        if j == i + 1:
+            out.append(h)
+        i = j
+    return out
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi) -> tuple[array, array]:
+    # patience step: lines occurring once on each side, longest increasing run.
+    # Counting sorts a copy of the hashes instead of building per-line dicts.
+    ua, ub = _unique_values(a, alo, ahi), _unique_values(b, blo, bhi)
+    common = array("q")
+    i = j = 0
+    while i < len(ua) and j < len(ub):
+        if ua[i] == ub[j]:
+            common.append(ua[i])
+            i += 1
+            j += 1
+        elif ua[i] < ub[j]:
+            i += 1
+        else:
+            j += 1
+    del ua, ub
+    pairs_i, pairs_j = array("q"), array("q")
+    if not common:
+        return pairs_i, pairs_j
+    pos_b = array("q", bytes(8 * len(common)))
+    for j in range(blo, bhi):
+        k = bisect_left(common, b[j])
+        if k < len(common) and common[k] == b[j]:
+            pos_b[k] = j
+    for i in range(alo, ahi):
+        k = bisect_left(common, a[i])
+        if k < len(common) and common[k] == a[i]:
+            pairs_i.append(i)
+            pairs_j.append(pos_b[k])
+    del common, pos_b
+
+    # longest increasing subsequence on the b side (patience sorting)
+    tails, tail_idx = array("q"), array("q")
+    prev = array("q", bytes(8 * len(pairs_j)))
+    for n, j in enumerate(pairs_j):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_idx.append(n)
+        else:
+            tails[k] = j
+            tail_idx[k] = n
+        prev[n] = tail_idx[k - 1] if k else -1
+    anchors_i, anchors_j = array("q"), array("q")
+    n = tail_idx[-1] if tail_idx else -1
+    while n != -1:
+        anchors_i.append(pairs_i[n])
+        anchors_j.append(pairs_j[n])
+        n = prev[n]
+    anchors_i.reverse()
+    anchors_j.reverse()
+    return anchors_i, anchors_j
+
+def _add_block(out: list, i: int, j: int, size: int):
+    # extend the previous block when the match continues it
+    if out:
+        pi, pj, psize = out[-1]
+        if pi + psize == i and pj + psize == j:
+            out[-1] = (pi, pj, psize + size)
+            return
+    out.append((i, j, size))
+
+def _match_region(a, alo, ahi, b, blo, bhi, out: list, patience: bool = True):
+    # appends maximal matching (i, j, size) blocks in order
+    end = ahi
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+    # the rest of the region is handled in this loop rather than by
+    # recursion, so long runs of splits cannot exhaust the stack
+    while True:
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            _add_block(out, start, blo - (alo - start), alo - start)
+        if alo == ahi or blo == bhi:
+            break
+        anchors_i, anchors_j = (
+            _unique_anchors(a, alo, ahi, b, blo, bhi) if patience else ((), ())
+        )
+        if anchors_i:
+            for i, j in zip(anchors_i, anchors_j):
+                if i > alo or j > blo:
+                    _match_region(a, alo, i, b, blo, j, out)
+                _add_block(out, i, j, 1)
+                alo, blo = i + 1, j + 1
+            continue
+        if ahi - alo > 1 and bhi - blo > 1:
+            split = _bisect(a, alo, ahi, b, blo, bhi, MAX_EDIT_STEPS)
+            if split is None:
+                break  # nothing in common worth finding: one replace
+            x, y = split
+            # no unique lines here, so none will appear in the sub-regions
+            # often enough to pay for another patience pass
+            _match_region(a, alo, alo + x, b, blo, blo + y, out, patience=False)
+            alo, blo, patience = alo + x, blo + y, False
+            continue
+        # a single line on one side: at most one match
+        for i in range(alo, ahi):
+            for j in range(blo, bhi):
+                if a[i] == b[j]:
+                    _add_block(out, i, j, 1)
+                    break
+            else:
+                continue
+            break
+        break
+    if end > ahi:
+        _add_block(out, ahi, bhi, end - ahi)
+
+def opcodes(a, b) -> list[tuple[str, int, int, int, int]]:
+    """difflib-style opcodes for two sequences of line hashes."""
+    blocks: list[tuple[int, int, int]] = []
+    _match_region(a, 0, len(a), b, 0, len(b), blocks)
+    blocks.append((len(a), len(b), 0))
+
+    codes = []
+    i = j = 0
+    for ai, bj, size in blocks:
+        if i < ai and j < bj:
+            codes.append(("replace", i, ai, j, bj))
+        elif i < ai:
+            codes.append(("delete", i, ai, j, bj))
+        elif j < bj:
+            codes.append(("insert", i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            codes.append(("equal", ai, i, bj, j))
+    return codes
+
+def grouped_opcodes(codes: list, n: int = CONTEXT) -> list[list]:
+    # same grouping rule as difflib.SequenceMatcher.get_grouped_opcodes
+    if not codes:
+        return []
+    codes = list(codes)
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    groups, group = [], []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > n * 2:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+    return groups
+
+# ---------- Formatting ----------
+class _Lines:
+    """Random access to lines of a file via the offsets from index_lines."""
+
+    def __init__(self, path: Path, offsets: array, view: CompressedFile | None = None):
+        self.f = path.open("rb") if view is None else None
+        self.view = view
+        self.offsets = offsets
+
+    def get(self, lo: int, hi: int) -> list[str]:
+        if lo >= hi:
+            return []
+        if self.view is not None:
+            # hunks are read in order, so the view keeps streaming forward
+            start = self.offsets[lo]
+            end = self.offsets[hi] if hi < len(self.offsets) else self.view.total_size()
+            return [
+                line.rstrip(b"\r").decode("utf-8", errors="replace")
+                for line in self.view.read(start, end - start).split(b"\n")[:hi - lo]
+            ]
+        self.f.seek(self.offsets[lo])
+        return [
+            self.f.readline().rstrip(b"\r\n").decode("utf-8", errors="replace")
+            for _ in range(hi - lo)
+        ]
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+
+def _range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    return f"{start + 1 if length else start},{length}"
+
+def _unified(groups, old: _Lines, new: _Lines) -> list[str]:
+    out = []
+    for group in groups:
+        first, last = group[0], group[-1]
+        out.append(f"@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                out.extend(" " + line for line in old.get(i1, i2))
+                continue
+            out.extend("-" + line for line in old.get(i1, i2))
+            out.extend("+" + line for line in new.get(j1, j2))
+    return out
+
+def _side_by_side(groups, old: _Lines, new: _Lines, width: int = SIDE_WIDTH) -> list[str]:
+    def cell(text: str) -> str:
+        return text[:width].ljust(width)
+
+    out = []
+    for group in groups:
+        first, last = group[0], group[-1]
+        out.append(f"@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@")
+        for tag, i1, i2, j1, j2 in group:
+            left, right = old.get(i1, i2), new.get(j1, j2)
+            mark = {"equal": " ", "delete": "<", "insert": ">", "replace": "|"}[tag]
+            for k in range(max(len(left), len(right))):
+                l = left[k] if k < len(left) else ""
+                r = right[k] if k < len(right) else ""
+                m = mark
+                if tag == "replace" and k >= min(len(left), len(right)):
+                    m = "<" if k < len(left) else ">"
+                out.append(f"{cell(l)} {m} {r}")
+    return out
+
+def diff_files(old_path: Path, new_path: Path, side_by_side: bool = False) -> tuple[bool, str]:
+    try:
+        old_view, new_view = _open_view(old_path), _open_view(new_path)
+        a, a_off = index_lines(old_path, old_view)
+        b, b_off = index_lines(new_path, new_view)
+        groups = grouped_opcodes(opcodes(a, b))
+        if not groups:
+            return True, f"No differences between {old_path.name} and {new_path.name}"
+        old, new = _Lines(old_path, a_off, old_view), _Lines(new_path, b_off, new_view)
+        try:
+            body = (_side_by_side if side_by_side else _unified)(groups, old, new)
+        finally:
+            old.close()
+            new.close()
+        return True, "\n".join([f"--- {old_path}", f"+++ {new_path}", *body])
+    except Exception as e:
+        return False, str(e)
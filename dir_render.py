@@ -1,12 +1,22 @@
 from pathlib import Path
 from dir_state import DirState
 
-def render_file_palette(ds: "DirState") -> str:
+def render_file_palette(ds: "DirState", height: int | None = None) -> str:
     if not ds.entries:
+        if ds.filtering or ds.filter_text:
+            return f"Filter: {ds.filter_text}\n  (no matches)"
         return "No directory loaded"
     lines = []
-    for i, p in enumerate(ds.entries):
-        name = p.name + ("/" if p.is_dir() else "")
+    if ds.filtering or ds.filter_text:
+        lines.append(f"Filter: {ds.filter_text}" + ("_" if ds.filtering else ""))
+    # only the rows that fit in the pane are formatted
+    rows = ds.visible_range(height - len(lines)) if height else range(len(ds.entries))
+    for i in rows:
+        p = ds.entries[i]
+        name = p.name + ("/" if ds.entry_is_dir[i] else "")
+        if ds.tree:
+            fold = ("▾ " if p in ds.expanded else "▸ ") if ds.entry_is_dir[i] else "  "
+            name = "  " * ds.entry_depth[i] + fold + name
         lines.append(f"▶ {name}" if i == ds.index else f"  {name}")
     return "\n".join(lines)
 
@@ -1,19 +1,253 @@
+import os
+from collections import OrderedDict
 from pathlib import Path
 
 #states the directory state and information about currrent working directory
 
+SORT_KEYS = ("name", "size", "mtime", "ext")
+CACHE_SIZE = 256  # max directory listings kept for tree expansion / revisits
+
+class Listing:
+    """One os.scandir pass over a directory, with stat columns and sort keys cached."""
+
+    def __init__(self, path: Path):
+        # taken before the scan so a change during it still forces a rescan
+        self.stamp: int = os.stat(path).st_mtime_ns
+        self.paths: list[Path] = []
+        self.lower: list[str] = []
+        self.is_dir: list[bool] = []
+        self.size: list[int] = []
+        self.mtime: list[float] = []
+        self._keys: dict[str, list[tuple]] = {}
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    st = entry.stat()
+                    size, mtime = st.st_size, st.st_mtime
+                except OSError:
+                    is_dir, size, mtime = False, 0, 0.0
+                self.paths.append(path / entry.name)
+                self.lower.append(entry.name.lower())
+                self.is_dir.append(is_dir)
+                self.size.append(size)
+                self.mtime.append(mtime)
+
+    def sort_keys(self, key: str) -> list[tuple]:
+        # keys are built once per listing and reused for every later sort
+        if key not in self._keys:
+            lower, is_dir = self.lower, self.is_dir
+            if key == "size":
+                col = self.size
+            elif key == "mtime":
+                col = self.mtime
+            elif key == "ext":
+                col = [os.path.splitext(n)[1] for n in lower]
+            else:
+                col = lower
+            self._keys[key] = [
+                (not is_dir[i], col[i], lower[i]) for i in range(len(lower))
+            ]
+        return self._keys[key]
+
+    def order(self, key: str, reverse: bool = False) -> list[int]:
+        keys = self.sort_keys(key)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        if reverse:
+            # keep directories grouped first even when reversed
+            dirs = [i for i in order if self.is_dir[i]]
+            files = [i for i in order if not self.is_dir[i]]
+            order = dirs[::-1] + files[::-1]
+        return order
+
 class DirState:
     def __init__(self, path: Path | None = None):
         self.cwd: Path | None = path
         self.entries: list[Path] = []
+        self.entry_is_dir: list[bool] = []
+        self.entry_depth: list[int] = []
         self.index: int = 0
+        self.top: int = 0
+        self.sort_key: str = "name"
+        self.reverse: bool = False
+        self.filter_text: str = ""
+        self.filtering: bool = False
+        self.tree: bool = False
+        self.expanded: set[Path] = set()
+        self._listing: Listing | None = None
+        self._cache: OrderedDict[Path, Listing] = OrderedDict()
+        self._order: list[int] = []
+        self._visible: list[int] = []
         if path and path.exists():
             self.load(path)
 
-    def load(self, path: Path):
+    def load(self, path: Path, use_cache: bool = False):
+        old_selected = self.selected if path == self.cwd else None
+        if path != self.cwd:
+            self.filter_text = ""
+            self.filtering = False
+            self.expanded.clear()
         self.cwd = path
-        self.entries = sorted(path.iterdir(), key=lambda p: (not p.is_dir(), p.name.lower()))
+        if not use_cache:
+            self._cache.pop(path, None)
+        self._listing = self._children(path)
+        self._resort()
+        self._publish(old_selected)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def _children(self, path: Path) -> Listing:
+        listing = self._cache.get(path)
+        if listing is not None and os.stat(path).st_mtime_ns != listing.stamp:
+            listing = None  # entries were added, removed or renamed since the scan
+        if listing is None:
+            listing = Listing(path)
+            self._cache[path] = listing
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(path)
+        return listing
+
+    # ---------- Sorting ----------
+    def _resort(self):
+        self._order = self._listing.order(self.sort_key, self.reverse) if self._listing else []
+        self._visible = self._match(self._order, self.filter_text)
+
+    def sort_by(self, key: str, reverse: bool = False) -> bool:
+        if key not in SORT_KEYS:
+            return False
+        old_selected = self.selected
+        self.sort_key = key
+        self.reverse = reverse
+        self._resort()
+        self._publish(old_selected)
+        return True
+
+    # ---------- Filtering ----------
+    def _match(self, candidates: list[int], text: str) -> list[int]:
+        if not text:
+            return list(candidates)
+        text = text.lower()
+        lower = self._listing.lower
+        return [i for i in candidates if text in lower[i]]
+
+    def set_filter(self, text: str):
+        old_selected = self.selected
+        if text.lower().startswith(self.filter_text.lower()):
+            # every match of the longer text also matched the shorter one
+            self._visible = self._match(self._visible, text)
+        else:
+            self._visible = self._match(self._order, text)
+        self.filter_text = text
+        self._publish(old_selected)
+
+    def clear_filter(self):
+        self.filtering = False
+        if self.filter_text:
+            self.set_filter("")
+
+    # ---------- Tree ----------
+    def set_tree(self, enabled: bool):
+        old_selected = self.selected
+        self.tree = enabled
+        self.expanded.clear()
+        self._publish(old_selected)
+
+    def _subtree_rows(self, path: Path, depth: int) -> list[tuple[Path, bool, int]]:
+        listing = self._children(path)
+        rows = []
+        for i in listing.order(self.sort_key, self.reverse):
+            child = listing.paths[i]
+            rows.append((child, listing.is_dir[i], depth))
+            if child in self.expanded:
+                rows.extend(self._subtree_rows(child, depth + 1))
+        return rows
+
+    def expand(self) -> bool:
+        i = self.index
+        if not self.tree or not self.entries or not self.entry_is_dir[i]:
+            return False
+        path = self.entries[i]
+        if path in self.expanded:
+            return True
+        self.expanded.add(path)
+        try:
+            rows = self._subtree_rows(path, self.entry_depth[i] + 1)
+        except OSError:
+            self.expanded.discard(path)
+            return False
+        self.entries[i + 1:i + 1] = [r[0] for r in rows]
+        self.entry_is_dir[i + 1:i + 1] = [r[1] for r in rows]
+        self.entry_depth[i + 1:i + 1] = [r[2] for r in rows]
+        return True
+
+    def collapse(self) -> bool:
+        i = self.index
+        if not self.tree or not self.entries:
+            return False
+        depth = self.entry_depth[i]
+        if self.entries[i] not in self.expanded:
+            # collapsing inside a subtree closes its parent
+            if depth == 0:
+                return False
+            while self.entry_depth[i] >= depth:
+                i -= 1
+            self.index = i
+            depth = self.entry_depth[i]
+        self.expanded.discard(self.entries[i])
+        end = i + 1
+        while end < len(self.entries) and self.entry_depth[end] > depth:
+            end += 1
+        del self.entries[i + 1:end]
+        del self.entry_is_dir[i + 1:end]
+        del self.entry_depth[i + 1:end]
+        return True
+
+    def toggle(self) -> bool:
+        if self.selected in self.expanded:
+            return self.collapse()
+        return self.expand()
+
+    # ---------- View ----------
+    def _publish(self, old_selected: Path | None = None):
+        paths, is_dir = (self._listing.paths, self._listing.is_dir) if self._listing else ([], [])
+        self.entries = [paths[i] for i in self._visible]
+        self.entry_is_dir = [is_dir[i] for i in self._visible]
+        self.entry_depth = [0] * len(self.entries)
+        if self.tree and self.expanded:
+            entries, flags, depths = [], [], []
+            for p, flag in zip(self.entries, self.entry_is_dir):
+                entries.append(p)
+                flags.append(flag)
+                depths.append(0)
+                if p in self.expanded:
+                    try:
+                        rows = self._subtree_rows(p, 1)
+                    except OSError:
+                        self.expanded.discard(p)
+                        continue
+                    entries.extend(r[0] for r in rows)
+                    flags.extend(r[1] for r in rows)
+                    depths.extend(r[2] for r in rows)
+            self.entries, self.entry_is_dir, self.entry_depth = entries, flags, depths
         self.index = 0
+        if old_selected is not None:
+            try:
+                self.index = self.entries.index(old_selected)
+            except ValueError:
+                pass
+
+    def visible_range(self, height: int) -> range:
+        # scroll just enough to keep the cursor row on screen
+        height = max(1, height)
+        if self.index < self.top:
+            self.top = self.index
+        elif self.index >= self.top + height:
+            self.top = self.index - height + 1
+        self.top = max(0, min(self.top, len(self.entries) - height))
+        return range(self.top, min(len(self.entries), self.top + height))
 
     @property
     def selected(self) -> Path | None:
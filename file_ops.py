@@ -1,6 +1,8 @@
 from pathlib import Path
 import shutil
 
+from compress_ops import open_compressed
+
 def read_file(path: Path) -> tuple[bool, str]:
     try:
         with path.open("r", encoding="utf-8") as f:
@@ -8,11 +10,16 @@ def read_file(path: Path) -> tuple[bool, str]:
     except Exception as e:
         return False, str(e)
 
-def write_file(path: Path, content: str) -> tuple[bool, str]:
+def _open_text(path: Path, mode: str, compress: str | None = None):
+    if compress:
+        return open_compressed(path, mode + "t", compress)
+    return path.open(mode, encoding="utf-8")
+
+def write_file(path: Path, content: str, compress: str | None = None) -> tuple[bool, str]:
     try:
-        with path.open("w", encoding="utf-8") as f:
+        with _open_text(path, "w", compress) as f:
             f.write(content)
-        return True, f"Written to {path.name}"
+        return True, f"Written to {path.name}" + (f" ({compress})" if compress else "")
     except Exception as e:
         return False, str(e)
 
@@ -34,3 +41,18 @@ def overwrite_file(path: Path, content: str) -> tuple[bool, str]:
         return True, f"Overwritten {path.name} (backup: {backup.name if path.exists() else 'none'})"
     except Exception as e:
         return False, str(e)
+
+def latest_backup(path: Path) -> Path | None:
+    # ow/overwrite_file leave NAME.bak and NAME.bak.<timestamp> next to the file
+    prefix = path.name + ".bak"
+    backups = {}
+    # plain name matching: the file name may contain glob characters
+    for p in path.parent.iterdir():
+        if not p.name.startswith(prefix):
+            continue
+        stamp = p.name[len(prefix) + 1:]
+        if p.name == prefix:
+            backups[p] = p.stat().st_mtime
+        elif p.name[len(prefix)] == "." and stamp.isdigit():
+            backups[p] = float(stamp)
+    return max(backups, key=backups.get, default=None)
@@ -0,0 +1,49 @@
+import random
+from pathlib import Path
+
+from diff_ops import diff_files, index_lines, opcodes
+
+def _apply(a: list, b: list, codes: list) -> list:
+    out = []
+    for tag, i1, i2, j1, j2 in codes:
+        out.extend(a[i1:i2] if tag == "equal" else b[j1:j2])
+    return out
+
+def _repetitive_log(lines: int, seed: int) -> list[str]:
+    # a handful of line kinds repeated over and over: no line is unique, so
+    # patience finds no anchors and everything is left to the bisect
+    rng = random.Random(seed)
+    return [f"INFO worker-{rng.randrange(7)} heartbeat ok\n" for _ in range(lines)]
+
+def test_opcodes_rebuild_new_side():
+    rng = random.Random(1)
+    for _ in range(200):
+        a = [rng.randrange(5) for _ in range(rng.randrange(40))]
+        b = [rng.randrange(5) for _ in range(rng.randrange(40))]
+        assert _apply(a, b, opcodes(a, b)) == b
+
+def test_repetitive_file_is_not_one_replace(tmp_path):
+    old, new = tmp_path / "old.log", tmp_path / "new.log"
+    a = _repetitive_log(20000, seed=2)
+    rng = random.Random(3)
+    b = list(a)
+    for _ in range(5000):
+        i = rng.randrange(len(b))
+        if rng.randrange(2):
+            del b[i]
+        else:
+            b.insert(i, f"WARN worker-{rng.randrange(7)} slow\n")
+    old.write_text("".join(a))
+    new.write_text("".join(b))
+
+    ha, hb = index_lines(old)[0], index_lines(new)[0]
+    codes = opcodes(ha, hb)
+    assert _apply(list(ha), list(hb), codes) == list(hb)
+    # 5000 small edits (past the step limit) must stay small hunks, not a
+    # 20000-line replace
+    changed = sum(i2 - i1 for tag, i1, i2, _, _ in codes if tag != "equal")
+    assert changed < 10000
+
+    ok, text = diff_files(old, new)
+    assert ok
+    assert sum(line.startswith("-") for line in text.splitlines()) < 10000
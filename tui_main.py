@@ -1,3 +1,4 @@
+import threading
 from pathlib import Path
 from datetime import datetime
 
@@ -13,8 +14,10 @@ from prompt_toolkit.document import Document
 from prompt_toolkit.styles import Style
 from prompt_toolkit.shortcuts import input_dialog
 
-from file_ops import write_file, append_file, read_file
-from dir_state import DirState
+from file_ops import write_file, append_file, read_file, latest_backup
+from diff_ops import diff_files
+from compress_ops import CompressedFile, detect_compression, compression_for
+from dir_state import DirState, SORT_KEYS
 from dir_render import render_file_palette
 from state import AppState
 
@@ -25,6 +28,10 @@ state = AppState()
 editors = []
 active_editor = 0
 pending_overwrite = None
+VIEW_BYTES = 1024 * 1024  # decompressed bytes shown per page of a compressed file
+compressed_counts = {}  # (path, size, mtime) -> (words, lines), filled when a file is opened
+counting = set()  # keys of compressed_counts still being counted in the background
+COUNT_CACHE_SIZE = 128
 
 HELP_CONTENT = """\
 Welcome to Maniot Editor!
@@ -40,6 +47,12 @@ ow FILE             → Overwrite FILE and keep a backup (.bak)
 mkdir PATH          → Create directory PATH
 rm PATH             → Remove file or directory PATH
 saveas FILE         → Save editor content as FILE
+sort KEY [desc]     → Sort directory pane by name, size, mtime or ext
+filter TEXT         → Show only entries containing TEXT (no TEXT clears)
+tree                → Toggle tree mode in directory pane
+diff [-y] FILE      → Diff FILE against its newest backup (-y side-by-side)
+seek OFFSET|end     → Jump to byte OFFSET of a compressed file view
+w/w!/ow -z FILE     → Save recompressed (gzip, bzip2 or xz, kept from FILE)
 
 --- Keybindings ---
 Ctrl+s              → Save current file
@@ -51,12 +64,15 @@ Alt+w               → Close current tab
 Alt+h / Alt+l       → Switch tab left/right
 Alt+q               → Quit editor
 Tab / Shift+Tab     → Switch Between Panes
+/                   → Type-as-you-go filter in directory pane (Esc clears)
+Right / Left        → Expand / collapse folder in tree mode
+Alt+j / Alt+k       → Next / previous page of a compressed file view
 
 --- Notes ---
 - Check for mode reset on prompting for operation
   save
 - Arrow keys navigate the directory pane
-- Enter opens files or enters directories
+- Enter opens files or enters directories (expands them in tree mode)
 - Multi-line editing is enabled by default
 - Existing files are never overwritten silently
 """
@@ -76,7 +92,9 @@ def new_editor(name=None, show_help=True):
         "file": None,
         "mode": "r",
         "dir": DirState(None),
-        "name": tab_name
+        "name": tab_name,
+        "view": None,
+        "view_range": (0, 0)
     })
 
 
@@ -152,14 +170,14 @@ input_pane = Frame(
     title="Command"
 )
 
-directory_pane = Frame(
-    Window(content=BufferControl(buffer=directory_buffer),
-           style=Condition(
-               lambda: "bg:#1f2933 fg:#e6e6e6"
-               if has_focus(directory_pane)()
-               else "bg:#161616 fg:#9aa0a6")),
-    title="Directory"
-)
+directory_window = Window(
+    content=BufferControl(buffer=directory_buffer),
+    style=Condition(
+        lambda: "bg:#1f2933 fg:#e6e6e6"
+        if has_focus(directory_pane)()
+        else "bg:#161616 fg:#9aa0a6"))
+
+directory_pane = Frame(directory_window, title="Directory")
 
 metadata_pane = Frame(
     Window(content=BufferControl(buffer=metadata_buffer, focusable=False),
@@ -195,19 +213,32 @@ root_container = HSplit([
 
 kb = KeyBindings()
 
+DEFAULT_DIR_HEIGHT = 30  # rows rendered before the pane has a known size
+
 # ---------------- Refresh ----------------
 def refresh_directory():
     d = current_editor()["dir"]
 
     if d.cwd:
-        set_ro(directory_buffer, render_file_palette(d))
+        info = directory_window.render_info
+        height = info.window_height if info else DEFAULT_DIR_HEIGHT
+        set_ro(directory_buffer, render_file_palette(d, height))
     else:
         set_ro(directory_buffer, "No directory loaded")
 
     if d.selected and d.selected.exists():
         s = d.selected.stat()
 
-        if d.selected.is_file():
+        fmt = detect_compression(d.selected) if d.selected.is_file() else None
+        if fmt:
+            # counting means decompressing everything, so it only happens on open
+            key = (d.selected, s.st_size, s.st_mtime)
+            words, lines = compressed_counts.get(
+                key, ("? (counting)" if key in counting else "? (open to count)", "?")
+            )
+
+            file_type = f"{d.selected.suffix or 'No extension'} ({fmt} compressed)"
+        elif d.selected.is_file():
             try:
                 text = d.selected.read_text(encoding="utf-8", errors="ignore")
                 words = len(text.split())
@@ -253,6 +284,7 @@ def refresh_current_dir():
         return
 
     old_selected = d.selected
+    d.invalidate()  # drop cached subtrees, they may be stale now
     d.load(d.cwd)  # authoritative reload from filesystem
 
     # Clamp index safely
@@ -268,10 +300,95 @@ def refresh_current_dir():
     refresh_directory()
 
 # ---------------- Editor Load ----------------
+def show_view_page(ed, offset: int) -> str | None:
+    # returns an error message if the page could not be read
+    try:
+        start, end, text = ed["view"].window(offset, VIEW_BYTES)
+    except Exception as e:
+        return f"Error reading {ed['file'].name}: {e}"
+    ed["view_range"] = (start, end)
+    ed["buffer"].set_document(Document(text, 0), bypass_readonly=True)
+    size = ed["view"].size
+    set_message(
+        f"Opened: {ed['file'].name} ({ed['view'].fmt}, bytes {start}-{end}"
+        f" of {size if size is not None else '?'})"
+    )
+    return None
+
+def count_compressed(path: Path):
+    # a full decompression pass, so it runs on its own thread with its own
+    # view; the result is stored on the UI loop and the metadata redrawn
+    try:
+        s = path.stat()
+    except OSError:
+        return
+    key = (path, s.st_size, s.st_mtime)
+    if key in compressed_counts or key in counting:
+        return
+    counting.add(key)
+
+    def done(result):
+        counting.discard(key)
+        if result:
+            compressed_counts[key] = result
+            if len(compressed_counts) > COUNT_CACHE_SIZE:
+                compressed_counts.pop(next(iter(compressed_counts)))
+        refresh_directory()
+
+    def work():
+        try:
+            result = CompressedFile(path).count()
+        except Exception:
+            result = None  # the metadata just stays unknown
+        if app.loop is not None:
+            app.loop.call_soon_threadsafe(done, result)
+        else:
+            done(result)
+
+    threading.Thread(target=work, daemon=True).start()
+
+def view_is_partial(ed) -> bool:
+    if not ed["view"]:
+        return False
+    start, end = ed["view_range"]
+    return start > 0 or ed["view"].size is None or end < ed["view"].size
+
+def refuse_partial_save(ed) -> bool:
+    if view_is_partial(ed):
+        set_message("Editor only holds one page of a compressed file; refusing to save it")
+        return True
+    return False
+
 def load_to_editor(path: Path, mode="r"):
-    ok, content = read_file(path)
     ed = current_editor()
+    fmt = detect_compression(path)
+    if fmt:
+        # compressed files are streamed into a read-only, paged view
+        ed["file"] = path
+        ed["view"] = CompressedFile(path, fmt)
+        error = show_view_page(ed, 0)
+        if error is None:
+            count_compressed(path)
+            if mode != "r":
+                set_message(f"Opened: {path.name} read-only; compressed files can't be edited in place")
+            ed["mode"] = "r"
+            ed["buffer"].read_only = Condition(lambda: ed["mode"] == "r")
+            refresh_editor()
+            return
+        # not really compressed data: open it like any other file
+        if load_to_editor_plain(path, mode):
+            set_message(f"{error}; opened as plain text")
+        else:
+            set_message(error)
+        return
+
+    load_to_editor_plain(path, mode)
 
+def load_to_editor_plain(path: Path, mode="r") -> bool:
+    ed = current_editor()
+
+    ok, content = read_file(path)
+    ed["view"] = None
     ed["file"] = path
     ed["mode"] = mode
     ed["buffer"].read_only = Condition(lambda: ed["mode"] == "r")
@@ -282,6 +399,7 @@ def load_to_editor(path: Path, mode="r"):
 
     set_message(f"Opened: {path.name}")
     refresh_editor()
+    return ok
 
 # ---------------- Commands ----------------
 def handle_command(text: str):
@@ -297,11 +415,24 @@ def handle_command(text: str):
     ed = current_editor()
     d = ed["dir"]
 
+    # "-z" asks w / w! / ow to recompress the saved file
+    compress = None
+    if cmd in ("w", "w!", "ow") and arg and arg.startswith("-z "):
+        arg = arg[3:].strip()
+        compress = compression_for(Path(arg))
+        if compress is None:
+            set_message(
+                f"Cannot tell which compression to use for '{arg}'; "
+                f"name it .gz, .bz2 or .xz"
+            )
+            return
+
     # ---------- Help ----------
     if cmd == ":help":
         ed["buffer"].set_document(Document(HELP_CONTENT), bypass_readonly=True)
         ed["file"] = None
         ed["mode"] = "r"
+        ed["view"] = None
         set_message("Help loaded")
         refresh_editor()
         return
@@ -352,6 +483,8 @@ def handle_command(text: str):
 
     # ---------- Append to file ----------
     if cmd == "a" and arg:
+        if refuse_partial_save(ed):
+            return
         fpath = Path(arg)
         ok, msg = append_file(fpath, ed["buffer"].text)
         set_message(msg)
@@ -362,6 +495,8 @@ def handle_command(text: str):
     
     #---------- Overwrite file ----------
     if cmd == "w" and arg:
+        if refuse_partial_save(ed):
+            return
         fpath = Path(arg)
 
         if fpath.exists():
@@ -371,7 +506,7 @@ def handle_command(text: str):
             )
             return
 
-        ok, msg = write_file(fpath, ed["buffer"].text)
+        ok, msg = write_file(fpath, ed["buffer"].text, compress)
         set_message(msg)
         refresh_status()
         refresh_current_dir()
@@ -380,9 +515,11 @@ def handle_command(text: str):
 
     #---------- Force overwrite ----------
     if cmd == "w!" and arg:
+        if refuse_partial_save(ed):
+            return
         fpath = Path(arg)
 
-        ok, msg = write_file(fpath, ed["buffer"].text)
+        ok, msg = write_file(fpath, ed["buffer"].text, compress)
         set_message(f"{msg} (forced)")
         refresh_status()
         refresh_current_dir()
@@ -393,6 +530,8 @@ def handle_command(text: str):
 
     # ---------- Overwrite with backup ----------
     if cmd == "ow" and arg:
+        if refuse_partial_save(ed):
+            return
         fpath = Path(arg)
 
         if fpath.exists():
@@ -405,7 +544,7 @@ def handle_command(text: str):
         else:
             backup = None
 
-        ok, msg = write_file(fpath, ed["buffer"].text)
+        ok, msg = write_file(fpath, ed["buffer"].text, compress)
         set_message(
             f"{msg} (backup: {backup.name if backup else 'none'})"
         )
@@ -448,13 +587,87 @@ def handle_command(text: str):
         refresh_current_dir()
         return
 
+    # ---------- Sort directory pane ----------
+    if cmd == "sort" and arg:
+        key, _, order = arg.partition(" ")
+        if not d.sort_by(key.lower(), order.strip().lower() == "desc"):
+            set_message(f"Unknown sort key '{key}'. Use one of: {', '.join(SORT_KEYS)}")
+            return
+        set_message(f"Sorted by {d.sort_key}{' (desc)' if d.reverse else ''}")
+        refresh_directory()
+        return
+
+    # ---------- Filter directory pane ----------
+    if cmd == "filter":
+        d.filtering = False
+        d.set_filter(arg or "")
+        set_message(f"Filter: {arg}" if arg else "Filter cleared")
+        refresh_directory()
+        return
+
+    # ---------- Tree mode ----------
+    if cmd == "tree":
+        d.set_tree(not d.tree)
+        set_message(f"Tree mode {'on' if d.tree else 'off'}")
+        refresh_directory()
+        return
+
+    # ---------- Diff against backup ----------
+    if cmd == "diff" and arg:
+        side_by_side = arg.startswith("-y ")
+        fpath = Path(arg[3:].strip() if side_by_side else arg)
+        if not fpath.is_file():
+            set_message(f"File does not exist: {fpath}")
+            return
+        backup = latest_backup(fpath)
+        if backup is None:
+            set_message(f"No backup found for: {fpath}")
+            return
+        ok, content = diff_files(backup, fpath, side_by_side)
+        if not ok:
+            set_message(f"Error diffing: {content}")
+            return
+        new_editor(f"diff {fpath.name}", show_help=False)
+        active_editor = len(editors) - 1
+        diff_ed = current_editor()
+        diff_ed["buffer"].set_document(Document(content, 0), bypass_readonly=True)
+        diff_ed["buffer"].read_only = Condition(lambda: diff_ed["mode"] == "r")
+        set_message(f"Diff: {backup.name} → {fpath.name}")
+        refresh_editor()
+        return
+
+    # ---------- Seek in compressed view ----------
+    if cmd == "seek" and arg:
+        if not ed["view"]:
+            set_message("seek only works on a compressed file view")
+            return
+        if arg == "end":
+            try:
+                offset = max(0, ed["view"].total_size() - VIEW_BYTES)
+            except Exception as e:
+                set_message(f"Error reading {ed['file'].name}: {e}")
+                return
+        elif arg.isdigit():
+            offset = int(arg)
+        else:
+            set_message("Usage: seek OFFSET|end")
+            return
+        error = show_view_page(ed, offset)
+        if error:
+            set_message(error)
+        refresh_status()
+        return
+
     # ---------- Save As ----------
     if cmd == "saveas" and arg:
+        if refuse_partial_save(ed):
+            return
         fpath = Path(arg)
         ok, msg = write_file(fpath, ed["buffer"].text)
         if ok:
             ed["file"] = fpath
             ed["mode"] = "w"
+            ed["view"] = None
         set_message(msg)
         refresh_status()
         refresh_current_dir()
@@ -475,16 +688,57 @@ def _(e):
         return
     if has_focus(directory_pane)():
         d = current_editor()["dir"]
+        if d.filtering:
+            d.filtering = False
+            refresh_directory()
+            return
         if not d.selected:
             return
-        if d.selected.is_dir():
-            d.load(d.selected)
-            set_message(f"Entered: {d.selected}")
+        if d.tree and d.entry_is_dir[d.index]:
+            d.toggle()
+            refresh_directory()
+        elif d.entry_is_dir[d.index]:
+            d.load(d.selected, use_cache=True)
+            set_message(f"Entered: {d.cwd}")
             refresh_directory()
         else:
             load_to_editor(d.selected, "r")
         return
 
+# ---------------- Directory filter ----------------
+filtering = Condition(lambda: current_editor()["dir"].filtering)
+
+@kb.add("/", filter=has_focus(directory_pane) & ~filtering)
+def _(e):
+    d = current_editor()["dir"]
+    d.filtering = True
+    set_message("Filter: type to narrow, Enter to keep, Esc to clear")
+    refresh_directory()
+
+@kb.add("<any>", filter=has_focus(directory_pane) & filtering)
+def _(e):
+    ch = e.data
+    if len(ch) != 1 or not ch.isprintable():
+        return
+    d = current_editor()["dir"]
+    d.set_filter(d.filter_text + ch)
+    refresh_directory()
+
+@kb.add("backspace", filter=has_focus(directory_pane) & filtering)
+def _(e):
+    d = current_editor()["dir"]
+    if d.filter_text:
+        d.set_filter(d.filter_text[:-1])
+    else:
+        d.filtering = False
+    refresh_directory()
+
+@kb.add("escape", filter=has_focus(directory_pane) & filtering)
+def _(e):
+    current_editor()["dir"].clear_filter()
+    set_message("Filter cleared")
+    refresh_directory()
+
 @kb.add("up", filter=has_focus(directory_pane))
 def _(e):
     d = current_editor()["dir"]
@@ -497,29 +751,43 @@ def _(e):
     d.index = min(len(d.entries)-1, d.index + 1)
     refresh_directory()
 
-@kb.add("backspace", filter=has_focus(directory_pane))
+tree_mode = Condition(lambda: current_editor()["dir"].tree)
+
+@kb.add("right", filter=has_focus(directory_pane) & tree_mode)
+def _(e):
+    d = current_editor()["dir"]
+    if d.selected and not d.expand() and d.entry_is_dir[d.index]:
+        set_message(f"Cannot open: {d.selected}")
+    refresh_directory()
+
+@kb.add("left", filter=has_focus(directory_pane) & tree_mode)
+def _(e):
+    current_editor()["dir"].collapse()
+    refresh_directory()
+
+@kb.add("backspace", filter=has_focus(directory_pane) & ~filtering)
 def _(e):
     d = current_editor()["dir"]
     if d.cwd == pt :
         set_message("Can't access direcory outside initial directory loaded !")
         return
     if d.cwd:
-        d.load(d.cwd.parent)
+        d.load(d.cwd.parent, use_cache=True)
         refresh_directory()
 
-@kb.add("a", filter=has_focus(directory_pane))
+@kb.add("a", filter=has_focus(directory_pane) & ~filtering)
 def _(e):
     d = current_editor()["dir"]
     if d.selected and d.selected.is_file():
         load_to_editor(d.selected, "a")
 
-@kb.add("w", filter=has_focus(directory_pane))
+@kb.add("w", filter=has_focus(directory_pane) & ~filtering)
 def _(e):
     d = current_editor()["dir"]
     if d.selected and d.selected.is_file():
         load_to_editor(d.selected, "w")
 
-@kb.add("o", filter=has_focus(directory_pane))
+@kb.add("o", filter=has_focus(directory_pane) & ~filtering)
 def _(e):
     d = current_editor()["dir"]
     if d.selected and d.selected.is_file():
@@ -552,6 +820,24 @@ def _(e):
         active_editor = max(0, active_editor - 1)
         refresh_editor()
 
+@kb.add("escape", "j")
+def _(e):
+    ed = current_editor()
+    if ed["view"] and not (ed["view"].size is not None and ed["view_range"][1] >= ed["view"].size):
+        error = show_view_page(ed, ed["view_range"][1])
+        if error:
+            set_message(error)
+        refresh_status()
+
+@kb.add("escape", "k")
+def _(e):
+    ed = current_editor()
+    if ed["view"] and ed["view_range"][0] > 0:
+        error = show_view_page(ed, ed["view_range"][0] - VIEW_BYTES)
+        if error:
+            set_message(error)
+        refresh_status()
+
 @kb.add("escape", "q")
 def _(e):
     e.app.exit()
@@ -565,11 +851,17 @@ def _(e):
     if not path:
         set_message("No file loaded in current tab")
         return
+    if ed["view"]:
+        set_message(f"{path.name} is compressed; use 'ow -z {path.name}' to save it")
+        return
     content = ed["buffer"].text
     ok, msg = write_file(path, content)
     set_message(msg)
     refresh_status()
-    refresh_directory()
+    if ok:
+        refresh_current_dir()  # drops cached listings with the old size/mtime
+    else:
+        refresh_directory()
     load_to_editor(d.selected, "r")
     e.app.layout.focus_previous()
     
@@ -583,7 +875,7 @@ def _(e):
         text="Enter file path:"
     ).run()
 
-    if not result:
+    if not result or refuse_partial_save(ed):
         return
 
     fpath = Path(result)
@@ -592,6 +884,7 @@ def _(e):
     if ok:
         ed["file"] = fpath
         ed["mode"] = "w"
+        ed["view"] = None
 
     set_message(msg)
     refresh_status()